@@ -3,15 +3,18 @@ import json
 import re
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, File, UploadFile, HTTPException
-from core.visual_search import get_image_embedding, search_index
+from core.visual_search import get_image_embedding, build_product_groups, search_index_grouped
 
 # Global variables to store resources
 faiss_index = None
 product_ids = None
+product_keys = None
+vector_groups = None
+group_layout = None
 
 # Load resources function that can be called both in lifespan and directly
 def load_resources():
-    global faiss_index, product_ids
+    global faiss_index, product_ids, product_keys, vector_groups, group_layout
     if faiss_index is None:
         faiss_index = faiss.read_index("data/faiss_index.bin")
 
@@ -20,6 +23,16 @@ def load_resources():
         with open("data/product_ids.json", "r") as f:
             product_ids = json.load(f)
 
+    if len(product_ids) != faiss_index.ntotal:
+        raise RuntimeError(
+            f"data/product_ids.json has {len(product_ids)} entries but the FAISS index "
+            f"has {faiss_index.ntotal} vectors; rebuild them with scripts/train_and_index.py"
+        )
+
+    if vector_groups is None:
+        # Several vectors (photos) can belong to the same product
+        product_keys, vector_groups, group_layout = build_product_groups(product_ids)
+
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     # Load resources on startup
@@ -36,40 +49,44 @@ app = FastAPI(title="Visual Search 2.0", lifespan=lifespan)
 load_resources()
 
 @app.post("/visual-search/")
-async def visual_search(file: UploadFile = File(...), top_k: int = 5):
+async def visual_search(file: UploadFile = File(...), top_k: int = 5, aggregate: str = "max"):
+    if aggregate not in ("max", "mean"):
+        raise HTTPException(status_code=400, detail="aggregate must be 'max' or 'mean'")
+
     image_bytes = await file.read()
     try:
-        # Ensure top_k doesn't exceed the number of items in the index
-        effective_top_k = min(top_k, len(product_ids))
+        # Ensure top_k doesn't exceed the number of products in the index
+        effective_top_k = min(top_k, len(product_keys))
 
         query_emb = get_image_embedding(image_bytes)
-        faiss_ids, scores = search_index(faiss_index, query_emb, k=effective_top_k)
+        groups, faiss_ids, scores = search_index_grouped(
+            faiss_index, query_emb, vector_groups, group_layout, k=effective_top_k, agg=aggregate
+        )
 
-        # Map FAISS index IDs to actual product IDs and names
+        # Map product groups to actual product IDs and names
         mapped_results = []
         valid_scores = []
 
-        for i, idx in enumerate(faiss_ids):
-            if 0 <= idx < len(product_ids):
-                product_id_str = product_ids[idx]
-
-                # Use regex to separate the product ID and name
-                # Pattern: <number>_<name>
-                match = re.match(r'(\d+)_(.+)', product_id_str)
-                if match:
-                    real_id = match.group(1)  # The numeric part
-                    name = match.group(2)     # The name part
-                else:
-                    # Fallback if the pattern doesn't match
-                    real_id = product_id_str
-                    name = product_id_str
-
-                mapped_results.append({
-                    "id": idx,
-                    "product_id": real_id,
-                    "name": name
-                })
-                valid_scores.append(scores[i])
+        for i, group in enumerate(groups):
+            product_id_str = product_keys[group]
+
+            # Use regex to separate the product ID and name
+            # Pattern: <number>_<name>
+            match = re.match(r'(\d+)_(.+)', product_id_str)
+            if match:
+                real_id = match.group(1)  # The numeric part
+                name = match.group(2)     # The name part
+            else:
+                # Fallback if the pattern doesn't match
+                real_id = product_id_str
+                name = product_id_str
+
+            mapped_results.append({
+                "id": faiss_ids[i],  # best-matching vector for this product
+                "product_id": real_id,
+                "name": name
+            })
+            valid_scores.append(scores[i])
 
         return {
             "results": mapped_results,
@@ -26,3 +26,70 @@ def build_faiss_index(embeddings: np.ndarray):
 def search_index(index: faiss.Index, query_emb: np.ndarray, k: int = 5):
     D, I = index.search(query_emb, k)
     return I.tolist()[0], D.tolist()[0]
+
+def build_product_groups(product_ids: list):
+    """
+    Map each vector ID to a product group.
+    Returns (product_keys, vector_groups, group_layout) where
+    product_keys[vector_groups[i]] is the product that FAISS vector i belongs
+    to, and group_layout = (offsets, members) lists the vector IDs of group g
+    as members[offsets[g]:offsets[g + 1]].
+    """
+    product_keys, vector_groups = np.unique(np.asarray(product_ids, dtype=str), return_inverse=True)
+    vector_groups = vector_groups.astype(np.int64)
+    members = np.argsort(vector_groups, kind="stable")
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(vector_groups, minlength=len(product_keys)))))
+    return product_keys.tolist(), vector_groups, (offsets, members)
+
+def _group_mean_distances(index: faiss.Index, query_emb: np.ndarray, group_layout, groups: np.ndarray):
+    """
+    Exact mean L2 distance from the query to every vector of each group.
+    """
+    offsets, members = group_layout
+    starts = offsets[groups]
+    counts = offsets[groups + 1] - starts
+    # Gather the member vector IDs of all groups in one flat array
+    seg = np.repeat(np.arange(len(groups)), counts)
+    pos = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    ids = members[starts[seg] + pos]
+
+    vecs = index.reconstruct_batch(ids)
+    dists = ((vecs - query_emb[0]) ** 2).sum(axis=1)
+    return np.bincount(seg, weights=dists, minlength=len(groups)) / counts
+
+def search_index_grouped(index: faiss.Index, query_emb: np.ndarray, vector_groups: np.ndarray,
+                         group_layout, k: int = 5, agg: str = "max", overfetch: int = 4):
+    """
+    Search the index and return the top-k distinct products.
+    Fetches k * overfetch vectors (growing until k products are found or the
+    index is exhausted) to pick candidate products, then scores each one:
+    "max" keeps the best-matching photo (smallest distance), "mean" averages
+    the distances to all of the product's photos.
+    Returns (group_ids, best_vector_ids, scores), best first.
+    """
+    if agg not in ("max", "mean"):
+        raise ValueError(f"Unknown aggregation: {agg}")
+
+    ntotal = index.ntotal
+    fetch = min(k * overfetch, ntotal)
+    while True:
+        D, I = index.search(query_emb, fetch)
+        D, I = D[0], I[0]
+        valid = (I >= 0) & (I < len(vector_groups))
+        D, I = D[valid], I[valid]
+        groups = vector_groups[I]
+
+        # FAISS returns hits sorted by distance, so the first occurrence of
+        # each group is its best-matching vector.
+        uniq, first = np.unique(groups, return_index=True)
+        if len(uniq) >= k or fetch >= ntotal:
+            break
+        fetch = min(fetch * 2, ntotal)
+
+    if agg == "max":
+        group_scores = D[first]
+    else:
+        group_scores = _group_mean_distances(index, query_emb, group_layout, uniq)
+
+    order = np.argsort(group_scores, kind="stable")[:k]
+    return uniq[order].tolist(), I[first[order]].tolist(), group_scores[order].tolist()
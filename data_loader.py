@@ -11,13 +11,22 @@ import requests
 def load_all_product_images_local(image_dir: str) -> List[Tuple[bytes, str]]:
     """
     Load all product images from a local directory.
-    Filenames must be <product_id>.<ext>, e.g. "1234.jpg".
-    Returns a list of (image_bytes, product_id).
+    Filenames must be <product_id>.<ext>, e.g. "1234.jpg", or images can be
+    grouped in a <product_id>/ subdirectory when a product has several photos.
+    Returns a list of (image_bytes, product_id), one entry per photo.
     """
     images = []
-    for fname in os.listdir(image_dir):
-        prod_id, _ = os.path.splitext(fname)
+    for fname in sorted(os.listdir(image_dir)):
         path = os.path.join(image_dir, fname)
+        if os.path.isdir(path):
+            # <product_id>/<any>.<ext>: every photo belongs to the same product
+            for sub in sorted(os.listdir(path)):
+                sub_path = os.path.join(path, sub)
+                if os.path.isfile(sub_path):
+                    with open(sub_path, "rb") as f:
+                        images.append((f.read(), fname))
+            continue
+        prod_id, _ = os.path.splitext(fname)
         with open(path, "rb") as f:
             img_bytes = f.read()
         images.append((img_bytes, prod_id))
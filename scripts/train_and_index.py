@@ -30,7 +30,7 @@ def parse_args():
     )
     p.add_argument(
         "--image-dir", type=str,
-        help="(local) path to images, named <product_id>.<ext>"
+        help="(local) path to images, named <product_id>.<ext> or in <product_id>/ folders"
     )
     p.add_argument(
         "--s3-bucket", type=str, help="(s3) bucket name"
@@ -48,7 +48,7 @@ def parse_args():
     )
     p.add_argument(
         "--output-ids", type=str, default="data/product_ids.json",
-        help="where to write the product‑ID list"
+        help="where to write the vector-ID -> product-ID list"
     )
     p.add_argument(
         "--tracking-uri", type=str, default=f"file://{os.getcwd()}/mlruns",
@@ -89,7 +89,8 @@ def main():
     images = load_images(args)
     product_ids = [pid for _, pid in images]
     num_images = len(images)
-    print(f"Loaded {num_images} images.")
+    num_products = len(set(product_ids))
+    print(f"Loaded {num_images} images of {num_products} products.")
 
     print("Computing embeddings…")
     embeddings = []
@@ -114,10 +115,12 @@ def main():
     run_params = {
         "source": args.source,
         "num_images": num_images,
+        "num_products": num_products,
         "embed_dim": emb_dim
     }
     run_metrics = {
-        "num_images": num_images
+        "num_images": num_images,
+        "num_products": num_products
     }
     run_artifacts = {
         "faiss_index": args.output_index,
@@ -118,3 +118,24 @@ def test_visual_search_response_consistency():
 
     # Both responses should be identical
     assert resp1.json() == resp2.json()
+
+def test_visual_search_distinct_products():
+    """Test that each product is returned at most once."""
+    for aggregate in ["max", "mean"]:
+        with open("images/5_person.jpeg", "rb") as f:
+            resp = client.post(f"/visual-search/?top_k=100&aggregate={aggregate}",
+                               files={"file": ("test_image.jpg", f, "image/jpeg")})
+
+        assert resp.status_code == 200
+        body = resp.json()
+
+        full_ids = [PRODUCT_IDS[result["id"]] for result in body["results"]]
+        assert len(full_ids) == len(set(full_ids))
+        assert len(body["results"]) <= min(100, len(set(PRODUCT_IDS)))
+
+def test_visual_search_invalid_aggregate():
+    """Test that an unknown aggregate is rejected."""
+    with open("images/5_person.jpeg", "rb") as f:
+        resp = client.post("/visual-search/?aggregate=median",
+                           files={"file": ("test_image.jpg", f, "image/jpeg")})
+    assert resp.status_code == 400
@@ -2,7 +2,10 @@ import pytest
 import os
 import numpy as np
 import faiss
-from core.visual_search import get_image_embedding, build_faiss_index, search_index
+from core.visual_search import (
+    get_image_embedding, build_faiss_index, search_index,
+    build_product_groups, search_index_grouped,
+)
 
 def test_embedding_shape():
     """Test that embeddings have the expected shape and search works."""
@@ -130,3 +133,80 @@ def test_faiss_index_persistence():
 
     # Clean up
     os.remove(temp_file)
+
+def test_build_product_groups():
+    """Test that several vector IDs map to the same product group."""
+    product_keys, vector_groups, (offsets, members) = build_product_groups(["b", "a", "b", "c", "a"])
+
+    assert len(product_keys) == 3
+    assert len(vector_groups) == 5
+    assert [product_keys[g] for g in vector_groups] == ["b", "a", "b", "c", "a"]
+
+    # Each group lists exactly its own vector IDs
+    for g, key in enumerate(product_keys):
+        group_ids = members[offsets[g]:offsets[g + 1]].tolist()
+        assert [product_keys[vector_groups[i]] for i in group_ids] == [key] * len(group_ids)
+    assert offsets[-1] == 5
+
+def test_search_index_grouped_returns_distinct_products():
+    """Test that grouped search returns k distinct products."""
+    # 4 products with 3 photos each
+    num_products, photos = 4, 3
+    dim = 512
+    embeddings = np.random.rand(num_products * photos, dim).astype(np.float32)
+    for i in range(len(embeddings)):
+        embeddings[i] = embeddings[i] / np.linalg.norm(embeddings[i])
+    product_ids = [f"{i // photos}_product" for i in range(len(embeddings))]
+
+    index = build_faiss_index(embeddings)
+    product_keys, vector_groups, group_layout = build_product_groups(product_ids)
+
+    query = embeddings[4].reshape(1, -1)  # A photo of product 1
+    for agg in ["max", "mean"]:
+        groups, ids, scores = search_index_grouped(index, query, vector_groups, group_layout, k=num_products, agg=agg)
+
+        # Each product appears exactly once
+        assert len(groups) == num_products
+        assert len(set(groups)) == num_products
+        assert scores == sorted(scores)
+        # Best vector IDs belong to their product
+        assert all(vector_groups[i] == g for i, g in zip(ids, groups))
+
+    groups, ids, scores = search_index_grouped(index, query, vector_groups, group_layout, k=1, agg="max")
+    assert product_keys[groups[0]] == "1_product"
+    assert ids == [4]
+    assert scores[0] < 0.01
+
+def test_search_index_grouped_invalid_agg():
+    """Test that an unknown aggregation is rejected."""
+    embeddings = np.random.rand(3, 512).astype(np.float32)
+    index = build_faiss_index(embeddings)
+    _, vector_groups, group_layout = build_product_groups(["a", "a", "b"])
+
+    with pytest.raises(ValueError):
+        search_index_grouped(index, embeddings[:1], vector_groups, group_layout, k=1, agg="median")
+
+def test_search_index_grouped_mean_uses_all_photos():
+    """Test that "mean" averages over all of a product's photos, not just the retrieved ones."""
+    # Squared L2 distances from the origin: A = 0.1/0.2/0.3, B = 0.15/5/5/5
+    sq_dists = [0.1, 0.2, 0.3, 0.15, 5.0, 5.0, 5.0]
+    embeddings = np.zeros((len(sq_dists), 2), dtype=np.float32)
+    embeddings[:, 0] = np.sqrt(sq_dists)
+    product_ids = ["A", "A", "A", "B", "B", "B", "B"]
+
+    index = faiss.IndexFlatL2(2)
+    index.add(embeddings)
+    product_keys, vector_groups, group_layout = build_product_groups(product_ids)
+    query = np.zeros((1, 2), dtype=np.float32)
+
+    for overfetch in [1, 4]:
+        groups, ids, scores = search_index_grouped(index, query, vector_groups, group_layout,
+                                                   k=2, agg="mean", overfetch=overfetch)
+
+        assert [product_keys[g] for g in groups] == ["A", "B"]
+        assert ids == [0, 3]  # Best-matching photo of each product
+        assert scores == pytest.approx([0.2, (0.15 + 15.0) / 4], rel=1e-5)
+
+    groups, _, scores = search_index_grouped(index, query, vector_groups, group_layout, k=2, agg="max")
+    assert [product_keys[g] for g in groups] == ["A", "B"]
+    assert scores == pytest.approx([0.1, 0.15], rel=1e-5)